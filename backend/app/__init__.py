@@ -1,7 +1,10 @@
 """Flask application factory."""
 from flask import Flask
 from flask_cors import CORS
+from flask_compress import Compress
 from config import config
+from app.extensions import cache
+from app.utils.json_provider import ORJSONProvider
 
 
 def create_app(config_name='default'):
@@ -9,6 +12,12 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    if not app.config['SUPABASE_JWT_SECRET']:
+        app.logger.warning('SUPABASE_JWT_SECRET is not set; access tokens will be verified with Supabase Auth on every request')
+
+    # Use orjson for jsonify() and request parsing
+    app.json = ORJSONProvider(app)
+
     # Enable CORS
     CORS(app, resources={
         r"/api/*": {
@@ -18,6 +27,19 @@ def create_app(config_name='default'):
         }
     })
 
+    # Compress JSON responses (br/gzip, negotiated via Accept-Encoding)
+    Compress(app)
+
+    # Response cache (used by the analytics endpoints)
+    cache.init_app(app)
+
+    # Create the shared Supabase client at boot rather than on the first request
+    if app.config['SUPABASE_URL'] and app.config['SUPABASE_SERVICE_ROLE_KEY']:
+        from app.services.supabase import get_supabase_client
+
+        with app.app_context():
+            get_supabase_client()
+
     # Register blueprints
     from app.routes.rag import rag_bp
     from app.routes.documents import documents_bp
@@ -0,0 +1,4 @@
+"""Flask extensions shared across blueprints (initialized in create_app)."""
+from flask_caching import Cache
+
+cache = Cache()
@@ -1,18 +1,109 @@
 """Analytics API endpoints."""
 from flask import Blueprint, request, jsonify
+from app.extensions import cache
 from app.services.supabase import get_supabase_client
 from app.services.gemini import call_gemini
 from app.utils.auth import require_auth
-from collections import Counter
+from app.utils.concurrency import submit
+from cachetools import TTLCache
 from datetime import datetime, timedelta, timezone
+import hashlib
 import logging
+import random
+import threading
 
 logger = logging.getLogger(__name__)
 analytics_bp = Blueprint('analytics', __name__)
 
+# Topic summaries keyed by the set of questions they were generated from
+_topic_cache = TTLCache(maxsize=256, ttl=600)
+_topic_cache_lock = threading.Lock()
+
+# Limits on how much question text is sent to Gemini for topic extraction
+_TOPIC_MIN_QUESTIONS = 3
+_TOPIC_SAMPLE_SIZE = 150
+_TOPIC_QUESTION_MAX_CHARS = 200
+
+# Questions go last so the constant instructions form a shared prompt prefix
+_TOPIC_PROMPT = """Analyze the following student questions and summarize the key topics being asked about in 3 detailed sentences.
+
+Return format: Exactly 3 sentences, each on a new line. Be specific and descriptive about what students are asking.
+
+Questions: {}"""
+
+
+def _analytics_cache_key(user, **kwargs) -> str:
+    """Cache key for analytics responses: path and query string, scoped by role."""
+    return f"analytics:{user.get('role')}:{request.full_path}"
+
+
+def _is_success(response) -> bool:
+    """Only cache successful responses (never 403s or errors)."""
+    return response[1] == 200
+
+
+def _fetch_metrics(course_id: str, since: str | None) -> dict:
+    """Get aggregated question metrics for a course from the course_analytics RPC."""
+    supabase = get_supabase_client()
+    return supabase.rpc('course_analytics', {
+        'filter_course_id': course_id,
+        'since': since
+    }).execute().data[0]
+
+
+def _extract_topics(qa_data: list) -> list:
+    """
+    Summarize the key topics in a set of questions using Gemini.
+
+    Results are cached by a hash of the question IDs, so repeat dashboard
+    loads over the same questions skip the Gemini call.
+
+    Args:
+        qa_data: QA log rows with 'id' and 'question'
+
+    Returns:
+        Up to 3 topic sentences
+    """
+    cache_key = hashlib.sha256(
+        b'|'.join(sorted(str(log['id']).encode() for log in qa_data))
+    ).hexdigest()
+
+    with _topic_cache_lock:
+        cached = _topic_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Combine a sample of questions into one text blob (seeded by the cache key so
+    # the same question set always produces the same prompt)
+    sample = random.Random(cache_key).sample(qa_data, min(_TOPIC_SAMPLE_SIZE, len(qa_data)))
+    questions_text = " ||| ".join(log['question'][:_TOPIC_QUESTION_MAX_CHARS] for log in sample)
+
+    # Create prompt for Gemini
+    prompt = _TOPIC_PROMPT.format(questions_text)
+
+    gemini_response = call_gemini(prompt, temperature=0.3)
+    # Split response into sentences (by newlines or periods)
+    response_text = gemini_response.strip()
+
+    # Try splitting by newlines first
+    sentences = [s.strip() for s in response_text.split('\n') if s.strip()]
+
+    # If we don't have 3 sentences, try splitting by periods
+    if len(sentences) < 3:
+        sentences = [s.strip() + '.' for s in response_text.split('.') if s.strip()]
+
+    # Take up to 3 sentences
+    topics = sentences[:3]
+
+    with _topic_cache_lock:
+        _topic_cache[cache_key] = topics
+
+    return topics
+
 
 @analytics_bp.route('/analytics/<course_id>', methods=['GET'])
 @require_auth
+@cache.cached(timeout=45, make_cache_key=_analytics_cache_key, response_filter=_is_success)
 def get_analytics(user, course_id):
     """
     Get analytics data for a course.
@@ -39,78 +130,39 @@ def get_analytics(user, course_id):
 
         supabase = get_supabase_client()
 
-        # Get all QA logs for the course
-        logs = supabase.table('qa_logs').select('*').eq('course_id', course_id).execute()
-        all_qa_data = logs.data
-
-        # Filter by time range
+        # Aggregate metrics in the database (time range filtered server-side)
+        since = None
         if time_range != 'all':
-            days = int(time_range)
-            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-            qa_data = [
-                log for log in all_qa_data
-                if log.get('created_at') and datetime.fromisoformat(log['created_at'].replace('Z', '+00:00')) >= cutoff_date
-            ]
-        else:
-            qa_data = all_qa_data
-
-        # Calculate metrics
-        total_questions = len(qa_data)
-
-        # Average rating
-        ratings = [log['rating'] for log in qa_data if log.get('rating')]
-        avg_rating = sum(ratings) / len(ratings) if ratings else 0
-
-        # Flagged count
-        flagged_count = len([log for log in qa_data if log['status'] == 'flagged'])
-
-        # Extract top concepts using Gemini API
-        top_concepts = []
-        if qa_data:
-            # Combine all questions into one text blob
-            questions_text = " ||| ".join([log['question'] for log in qa_data])
+            since = (datetime.now(timezone.utc) - timedelta(days=int(time_range))).isoformat()
 
-            # Create prompt for Gemini
-            prompt = f"""Analyze the following student questions and summarize the key topics being asked about in 3 detailed sentences.
+        # Metrics RPC runs in the background while topics are extracted
+        metrics_future = submit(_fetch_metrics, course_id, since)
 
-Questions: {questions_text}
+        # Questions are still needed for topic extraction
+        query = supabase.table('qa_logs').select('id, question').eq('course_id', course_id)
+        if since:
+            query = query.gte('created_at', since)
 
-Return format: Exactly 3 sentences, each on a new line. Be specific and descriptive about what students are asking."""
+        qa_data = query.execute().data
 
+        # Extract top concepts using Gemini API (not worth a call for a handful of questions)
+        top_concepts = []
+        if len(qa_data) >= _TOPIC_MIN_QUESTIONS:
             try:
-                gemini_response = call_gemini(prompt, temperature=0.3)
-                # Split response into sentences (by newlines or periods)
-                response_text = gemini_response.strip()
-
-                # Try splitting by newlines first
-                sentences = [s.strip() for s in response_text.split('\n') if s.strip()]
-
-                # If we don't have 3 sentences, try splitting by periods
-                if len(sentences) < 3:
-                    sentences = [s.strip() + '.' for s in response_text.split('.') if s.strip()]
-
-                # Take up to 3 sentences
-                top_concepts = sentences[:3]
+                top_concepts = _extract_topics(qa_data)
 
             except Exception as e:
                 logger.error(f"Error calling Gemini for topic extraction: {str(e)}")
                 top_concepts = []
 
-        # Question volume over time (grouped by day)
-        volume_by_date = {}
-        for log in qa_data:
-            created_at = log.get('created_at', '')
-            date = created_at.split('T')[0] if created_at else 'unknown'
-            volume_by_date[date] = volume_by_date.get(date, 0) + 1
-
-        question_volume = [{'date': date, 'count': count} for date, count in sorted(volume_by_date.items())]
+        metrics = metrics_future.result()
 
         analytics_data = {
-            'total_questions': total_questions,
-            'avg_rating': round(avg_rating, 2),
-            'flagged_count': flagged_count,
+            'total_questions': metrics['total_questions'],
+            'avg_rating': round(float(metrics['avg_rating']), 2),
+            'flagged_count': metrics['flagged_count'],
             'top_concepts': top_concepts,
-            'question_volume': question_volume
+            'question_volume': metrics['volume']
         }
 
         return jsonify(analytics_data), 200
@@ -130,7 +182,9 @@ def get_flagged_questions(user, course_id):
             return jsonify({'error': 'Unauthorized'}), 403
 
         supabase = get_supabase_client()
-        response = supabase.table('qa_logs').select('*').eq('course_id', course_id).eq('status', 'flagged').execute()
+        response = supabase.table('qa_logs').select(
+            'id, course_id, question, ai_answer, sources_cited, rating, status, created_at'
+        ).eq('course_id', course_id).eq('status', 'flagged').execute()
 
         return jsonify({'flagged_questions': response.data}), 200
 
@@ -2,11 +2,18 @@
 from flask import Blueprint, jsonify
 from app.services.supabase import get_supabase_client
 from app.utils.auth import require_auth
+from app.utils.concurrency import submit
 import logging
 
 logger = logging.getLogger(__name__)
 chat_logs_bp = Blueprint('chat_logs', __name__)
 
+# Everything the chat-log view shows (not question_embedding, which is large and unused there)
+_CHAT_LOG_COLUMNS = (
+    'id, course_id, user_id, question, ai_answer, sources_cited, rating, status, '
+    'confidence_score, created_at, ...users(user_email:email)'
+)
+
 
 @chat_logs_bp.route('/chat-logs/students/<course_id>', methods=['GET'])
 @require_auth
@@ -25,30 +32,18 @@ def get_students_with_questions(user, course_id):
         if course.data['instructor_id'] != user['id'] and user.get('role') not in ['ta', 'instructor']:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        # Get all QA logs for this course with user information
-        # Join with users table to get role
-        qa_logs = supabase.table('qa_logs').select('user_id, users(email, role)').eq('course_id', course_id).execute()
-
-        # Group by student and count questions (filter out TAs and instructors)
-        student_map = {}
-        for log in qa_logs.data:
-            user_id = log['user_id']
-            user_data = log.get('users', {})
-            user_role = user_data.get('role', 'student')
-
-            # Only include students (skip TAs and instructors)
-            if user_role not in ['student']:
-                continue
+        # Question counts per student are aggregated in the database
+        # (TAs and instructors are excluded there)
+        response = supabase.rpc('course_students', {'filter_course_id': course_id}).execute()
 
-            if user_id not in student_map:
-                student_map[user_id] = {
-                    'id': user_id,
-                    'email': user_data.get('email', 'Unknown'),
-                    'questionCount': 0
-                }
-            student_map[user_id]['questionCount'] += 1
-
-        students = list(student_map.values())
+        students = [
+            {
+                'id': student['id'],
+                'email': student.get('email') or 'Unknown',
+                'questionCount': student['question_count']
+            }
+            for student in response.data or []
+        ]
 
         return jsonify({'students': students}), 200
 
@@ -68,29 +63,35 @@ def get_student_chat_logs(user, course_id, student_id):
         student_id: Student user ID
     """
     try:
-        # Verify user is instructor/TA for this course
         supabase = get_supabase_client()
-        course = supabase.table('courses').select('instructor_id').eq('id', course_id).single().execute()
+
+        # The authorization lookups and the log fetch are independent, so run them concurrently
+        course_future = submit(
+            lambda: supabase.table('courses').select('instructor_id').eq('id', course_id).single().execute()
+        )
+        student_future = submit(
+            lambda: supabase.table('users').select('role').eq('id', student_id).single().execute()
+        )
+        logs_future = submit(
+            lambda: supabase.table('qa_logs').select(_CHAT_LOG_COLUMNS).eq('course_id', course_id).eq('user_id', student_id).order('created_at', desc=True).execute()
+        )
+
+        # Verify user is instructor/TA for this course
+        course = course_future.result()
 
         if course.data['instructor_id'] != user['id'] and user.get('role') not in ['ta', 'instructor']:
             return jsonify({'error': 'Unauthorized'}), 403
 
         # Verify that the student_id belongs to a student (not TA/instructor)
-        student_user = supabase.table('users').select('email, role').eq('id', student_id).single().execute()
+        student_user = student_future.result()
 
         if not student_user.data or student_user.data.get('role') != 'student':
             return jsonify({'error': 'User is not a student'}), 403
 
-        # Get all QA logs for this student in this course
-        response = supabase.table('qa_logs').select('*').eq('course_id', course_id).eq('user_id', student_id).order('created_at', desc=True).execute()
-
-        user_email = student_user.data.get('email', 'Unknown')
-
-        logs = response.data
-        for log in logs:
-            log['user_email'] = user_email
+        # Get all QA logs for this student in this course (user_email is joined in by PostgREST)
+        response = logs_future.result()
 
-        return jsonify({'logs': logs}), 200
+        return jsonify({'logs': response.data}), 200
 
     except Exception as e:
         logger.error(f"Error fetching chat logs for student {student_id} in course {course_id}: {str(e)}")
@@ -1,5 +1,6 @@
 """Course management API endpoints."""
 from flask import Blueprint, request, jsonify
+from app.services.courses import invalidate_system_prompt
 from app.services.supabase import get_supabase_client
 from app.utils.auth import require_auth
 import logging
@@ -113,6 +114,9 @@ def update_course(user, course_id):
 
         response = supabase.table('courses').update(update_data).eq('id', course_id).execute()
 
+        if 'system_prompt' in update_data:
+            invalidate_system_prompt(course_id)
+
         return jsonify({
             'message': 'Course updated successfully',
             'course': response.data[0]
@@ -4,12 +4,48 @@ from app.services.pdf_processor import process_pdf
 from app.services.vtt_processor import process_vtt
 from app.services.supabase import get_supabase_client
 from app.utils.auth import require_auth
+from app.utils.concurrency import run_in_background
 import logging
 
 logger = logging.getLogger(__name__)
 documents_bp = Blueprint('documents', __name__)
 
 
+def _process_document(document_id: str, document_type: str, file_bytes: bytes, course_id: str, file_name: str):
+    """
+    Parse, chunk and embed an uploaded document, tracking progress in processing_status.
+
+    Runs on the background pool, where nothing reads the result, so every
+    failure is logged here and a final status ('completed' or 'failed') is
+    always written, even if the 'processing' update fails.
+    """
+    supabase = get_supabase_client()
+    status = 'failed'
+
+    try:
+        supabase.table('course_documents').update({
+            'processing_status': 'processing'
+        }).eq('id', document_id).execute()
+
+        if document_type == 'pdf':
+            process_pdf(document_id, file_bytes, course_id, file_name)
+        elif document_type == 'vtt':
+            process_vtt(document_id, file_bytes, course_id, file_name)
+
+        status = 'completed'
+
+    except Exception as e:
+        logger.error(f"Error processing document {document_id}: {str(e)}")
+
+    try:
+        supabase.table('course_documents').update({
+            'processing_status': status
+        }).eq('id', document_id).execute()
+
+    except Exception as e:
+        logger.error(f"Error recording processing status '{status}' for document {document_id}: {str(e)}")
+
+
 @documents_bp.route('/upload-document', methods=['POST'])
 @require_auth
 def upload_document(user):
@@ -41,11 +77,13 @@ def upload_document(user):
 
         supabase = get_supabase_client()
 
-        # Upload file to Supabase Storage
+        # Upload file to Supabase Storage (the same bytes are processed below,
+        # so the file is never downloaded back from storage)
         file_path = f"{course_id}/{file.filename}"
+        file_bytes = file.read()
         storage_response = supabase.storage.from_('course-documents').upload(
             file_path,
-            file.read(),
+            file_bytes,
             {'content-type': file.content_type}
         )
 
@@ -55,30 +93,26 @@ def upload_document(user):
             'file_name': file.filename,
             'storage_path': file_path,
             'type': document_type,
-            'processing_status': 'pending'
+            'processing_status': 'completed' if document_type == 'video' else 'pending'
         }
         doc_response = supabase.table('course_documents').insert(document_record).execute()
         document_id = doc_response.data[0]['id']
 
-        # Process document based on type
-        if document_type == 'pdf':
-            # Get the file URL and process
-            file_url = supabase.storage.from_('course-documents').get_public_url(file_path)
-            process_pdf(document_id, file_url, course_id)
-        elif document_type == 'vtt':
-            file_url = supabase.storage.from_('course-documents').get_public_url(file_path)
-            process_vtt(document_id, file_url, course_id)
         # Video files don't need processing, just storage
+        if document_type == 'video':
+            return jsonify({
+                'message': 'Document uploaded successfully',
+                'document_id': document_id
+            }), 200
 
-        # Update processing status
-        supabase.table('course_documents').update({
-            'processing_status': 'completed'
-        }).eq('id', document_id).execute()
+        # Parsing and embedding can take minutes, so it runs after the response;
+        # clients poll /documents/<course_id> for processing_status
+        run_in_background(_process_document, document_id, document_type, file_bytes, course_id, file.filename)
 
         return jsonify({
-            'message': 'Document uploaded successfully',
+            'message': 'Document uploaded, processing started',
             'document_id': document_id
-        }), 200
+        }), 202
 
     except Exception as e:
         logger.error(f"Error in upload_document: {str(e)}")
@@ -1,14 +1,96 @@
 """RAG (Retrieval-Augmented Generation) API endpoints."""
-from flask import Blueprint, request, jsonify
-from app.services.gemini import generate_embedding, generate_answer
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.services.courses import get_system_prompt
+from app.services.gemini import generate_embedding, generate_answer, stream_answer, finalize_answer, no_context_answer
 from app.services.supabase import get_supabase_client
 from app.utils.auth import require_auth
+from app.utils.concurrency import submit
+from app.utils.vectors import halfvec_literal
 import logging
 
 logger = logging.getLogger(__name__)
 rag_bp = Blueprint('rag', __name__)
 
 
+def _retrieve_context(question: str, course_id: str) -> dict:
+    """
+    Embed the question and gather everything needed to answer it.
+
+    Returns:
+        {
+            "question_embedding": list,
+            "context_chunks": list,
+            "verified_answers": list,
+            "system_prompt": str
+        }
+    """
+    # 1. Get course system prompt (usually cached); it doesn't depend on the
+    # embedding, so it is fetched while the question is embedded
+    prompt_future = submit(get_system_prompt, course_id)
+
+    # 2. Generate embedding for the question
+    question_embedding = generate_embedding(question)
+
+    # 3. Perform vector similarity searches concurrently
+    supabase = get_supabase_client()
+
+    # Search document chunks
+    # (compared at halfvec precision, so the compact literal loses nothing)
+    chunks_future = submit(lambda: supabase.rpc('match_document_chunks', {
+        'query_embedding': halfvec_literal(question_embedding),
+        'match_count': 3,
+        'filter_course_id': course_id
+    }).execute())
+
+    # Search TA-verified answers
+    verified_future = submit(lambda: supabase.rpc('match_verified_answers', {
+        'query_embedding': question_embedding,
+        'match_count': 2,
+        'filter_course_id': course_id
+    }).execute())
+
+    chunks_response = chunks_future.result()
+    verified_response = verified_future.result()
+    system_prompt = prompt_future.result()
+
+    return {
+        'question_embedding': question_embedding,
+        # Get all context sources (use all for answer generation)
+        'context_chunks': chunks_response.data if chunks_response.data else [],
+        'verified_answers': verified_response.data if verified_response.data else [],
+        'system_prompt': system_prompt
+    }
+
+
+def _log_interaction(user: dict, course_id: str, question: str, question_embedding: list, answer_data: dict):
+    """
+    Record a Q&A interaction in qa_logs (with the question embedding, for reuse by corrections).
+
+    Runs off the request path (see submit), so failures are logged rather than raised.
+    """
+    try:
+        supabase = get_supabase_client()
+        log_entry = {
+            'course_id': course_id,
+            'user_id': user['id'],
+            'question': question,
+            'question_embedding': question_embedding,
+            'ai_answer': answer_data['answer'],
+            'sources_cited': answer_data['citations'],
+            'confidence_score': answer_data['confidence_score'],
+            'status': 'answered'
+        }
+        supabase.table('qa_logs').insert(log_entry).execute()
+
+    except Exception as e:
+        logger.error(f"Error logging Q&A interaction for course {course_id}: {str(e)}")
+
+
+def _sse_event(event: str, data) -> str:
+    """Format a server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
 @rag_bp.route('/ask-question', methods=['POST'])
 @require_auth
 def ask_question(user):
@@ -38,53 +120,18 @@ def ask_question(user):
 
         logger.info(f"Processing question for course {course_id}: {question[:50]}...")
 
-        # 1. Generate embedding for the question
-        question_embedding = generate_embedding(question)
-
-        # 2. Perform vector similarity search
-        supabase = get_supabase_client()
-
-        # Search document chunks
-        chunks_response = supabase.rpc('match_document_chunks', {
-            'query_embedding': question_embedding,
-            'match_count': 3,
-            'filter_course_id': course_id
-        }).execute()
-
-        # Search TA-verified answers
-        verified_response = supabase.rpc('match_verified_answers', {
-            'query_embedding': question_embedding,
-            'match_count': 2,
-            'filter_course_id': course_id
-        }).execute()
-
-        # Get all context sources (use all for answer generation)
-        context_chunks = chunks_response.data if chunks_response.data else []
-        verified_answers = verified_response.data if verified_response.data else []
-
-        # 3. Get course system prompt
-        course = supabase.table('courses').select('system_prompt').eq('id', course_id).single().execute()
-        system_prompt = course.data.get('system_prompt', 'You are a helpful teaching assistant.')
+        context = _retrieve_context(question, course_id)
 
         # 4. Generate answer using Gemini
         answer_data = generate_answer(
             question=question,
-            context_chunks=context_chunks,
-            verified_answers=verified_answers,
-            system_prompt=system_prompt
+            context_chunks=context['context_chunks'],
+            verified_answers=context['verified_answers'],
+            system_prompt=context['system_prompt']
         )
 
-        # 5. Log the Q&A interaction
-        log_entry = {
-            'course_id': course_id,
-            'user_id': user['id'],
-            'question': question,
-            'ai_answer': answer_data['answer'],
-            'sources_cited': answer_data['citations'],
-            'confidence_score': answer_data['confidence_score'],
-            'status': 'answered'
-        }
-        supabase.table('qa_logs').insert(log_entry).execute()
+        # 5. Log the Q&A interaction (the response doesn't wait for the insert)
+        submit(_log_interaction, user, course_id, question, context['question_embedding'], answer_data)
 
         return jsonify(answer_data), 200
 
@@ -93,6 +140,77 @@ def ask_question(user):
         return jsonify({'error': 'Failed to process question'}), 500
 
 
+@rag_bp.route('/ask-question/stream', methods=['POST'])
+@require_auth
+def ask_question_stream(user):
+    """
+    Handle student question, streaming the AI-generated answer as server-sent events.
+
+    Request body: same as /ask-question
+
+    Events:
+        token: {"text": str}       - next fragment of the answer
+        done:  {...}               - final payload (same shape as /ask-question)
+        error: {"error": str}      - answer generation failed
+    """
+    try:
+        data = request.json
+        question = data.get('question')
+        course_id = data.get('course_id')
+
+        if not question or not course_id:
+            return jsonify({'error': 'Missing question or course_id'}), 400
+
+        logger.info(f"Streaming answer for course {course_id}: {question[:50]}...")
+
+        context = _retrieve_context(question, course_id)
+
+    except Exception as e:
+        logger.error(f"Error in ask_question_stream: {str(e)}")
+        return jsonify({'error': 'Failed to process question'}), 500
+
+    def generate():
+        try:
+            # With nothing retrieved the answer is fixed; send it without calling Gemini
+            if not context['context_chunks'] and not context['verified_answers']:
+                answer_data = no_context_answer()
+                submit(_log_interaction, user, course_id, question, context['question_embedding'], answer_data)
+
+                yield _sse_event('token', {'text': answer_data['answer']})
+                yield _sse_event('done', answer_data)
+                return
+
+            answer_stream = stream_answer(
+                question=question,
+                context_chunks=context['context_chunks'],
+                verified_answers=context['verified_answers'],
+                system_prompt=context['system_prompt']
+            )
+            for text in answer_stream:
+                yield _sse_event('token', {'text': text})
+
+            # Citations and confidence need the complete answer
+            answer_data = finalize_answer(
+                answer_stream.text,
+                context['context_chunks'],
+                context['verified_answers']
+            )
+
+            submit(_log_interaction, user, course_id, question, context['question_embedding'], answer_data)
+
+            yield _sse_event('done', answer_data)
+
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            yield _sse_event('error', {'error': 'Failed to process question'})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @rag_bp.route('/submit-correction', methods=['POST'])
 @require_auth
 def submit_correction(user):
@@ -121,12 +239,12 @@ def submit_correction(user):
 
         supabase = get_supabase_client()
 
-        # Get original question from qa_log
-        qa_log = supabase.table('qa_logs').select('question').eq('id', qa_log_id).single().execute()
+        # Get original question (and its embedding, stored when it was answered) from qa_log
+        qa_log = supabase.table('qa_logs').select('question, question_embedding').eq('id', qa_log_id).single().execute()
         question = qa_log.data['question']
 
-        # Generate embedding for the question
-        question_embedding = generate_embedding(question)
+        # Logs from before question_embedding was stored need a fresh embedding
+        question_embedding = qa_log.data['question_embedding'] or generate_embedding(question)
 
         # Insert verified answer
         verified_entry = {
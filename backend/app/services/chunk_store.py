@@ -0,0 +1,131 @@
+"""Storage of embedded document chunks."""
+from collections import deque
+from contextlib import contextmanager
+from psycopg.types.json import Jsonb
+from app.services.embedding_cache import prune_embedding_cache
+from app.services.gemini import iter_embedding_batches
+from app.services.supabase import get_db_pool, get_supabase_client
+from app.utils.vectors import halfvec_literal
+import hashlib
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Namespace for deterministic chunk ids (uuid5), so reprocessing a document is idempotent
+_CHUNK_ID_NAMESPACE = uuid.UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8')
+
+# COPY can't skip conflicting rows, so batches are copied into a staging table first
+_STAGING_SQL = """
+CREATE TEMP TABLE document_chunks_staging
+  (LIKE public.document_chunks INCLUDING DEFAULTS) ON COMMIT DROP
+"""
+_COPY_SQL = 'COPY document_chunks_staging (id, document_id, content, metadata, embedding) FROM STDIN'
+_MERGE_SQL = """
+INSERT INTO public.document_chunks (id, document_id, content, metadata, embedding)
+SELECT id, document_id, content, metadata, embedding FROM document_chunks_staging
+ON CONFLICT (id) DO NOTHING;
+TRUNCATE document_chunks_staging
+"""
+
+
+def embed_and_store_chunks(records) -> int:
+    """
+    Embed document chunk records and insert them into document_chunks.
+
+    Records are consumed lazily and embedding and storage are pipelined:
+    each embedding batch is written as soon as it is ready, while later
+    batches are still being embedded. Only the batches in flight are held
+    in memory, so records can be a generator over a large document.
+
+    Args:
+        records: Iterable of chunk records ({'document_id', 'content', 'metadata'}) without embeddings
+
+    Returns:
+        Number of chunks processed (chunks that already exist are skipped, not rewritten)
+    """
+    # Records whose content has been handed to the embedder but not yet stored
+    pending = deque()
+
+    def contents():
+        for record in records:
+            record['id'] = chunk_id(record)
+            pending.append(record)
+            yield record['content']
+
+    stored = 0
+    with _chunk_writer() as write_batch:
+        for batch_embeddings in iter_embedding_batches(contents()):
+            batch = [pending.popleft() for _ in batch_embeddings]
+            for record, embedding in zip(batch, batch_embeddings):
+                record['embedding'] = embedding
+
+            write_batch(batch)
+            stored += len(batch)
+
+    # Expire old cache entries (at most daily per process)
+    prune_embedding_cache(get_supabase_client())
+
+    return stored
+
+
+def chunk_id(record: dict) -> str:
+    """
+    Deterministic id for a chunk record.
+
+    Derived from the document, the chunk's position metadata and a hash of
+    its content, so the same chunk always maps to the same row while
+    identical text elsewhere (another page, another document) does not.
+
+    Args:
+        record: Chunk record ({'document_id', 'content', 'metadata'})
+
+    Returns:
+        UUID string
+    """
+    content_hash = hashlib.sha256(record['content'].encode()).hexdigest()
+    position = json.dumps(record['metadata'], sort_keys=True)
+    return str(uuid.uuid5(_CHUNK_ID_NAMESPACE, f"{record['document_id']}:{position}:{content_hash}"))
+
+
+@contextmanager
+def _chunk_writer():
+    """
+    Yield a function that writes a batch of chunk records.
+
+    Uses COPY over a direct Postgres connection when SUPABASE_DB_URL is set
+    (much cheaper than JSON through PostgREST for large vectors, and the
+    whole document is written in one transaction). Falls back to bulk
+    upserts through the Supabase REST API otherwise. Either way, chunks
+    whose id already exists are left untouched.
+    """
+    db_pool = get_db_pool()
+
+    if db_pool is None:
+        supabase = get_supabase_client()
+        yield lambda batch: supabase.table('document_chunks').upsert(
+            [{**record, 'embedding': halfvec_literal(record['embedding'])} for record in batch],
+            ignore_duplicates=True,
+            returning='minimal'
+        ).execute()
+        return
+
+    with db_pool.connection() as conn:
+        conn.execute(_STAGING_SQL)
+
+        def copy_batch(batch: list):
+            with conn.cursor() as cur:
+                with cur.copy(_COPY_SQL) as copy:
+                    for record in batch:
+                        copy.write_row((
+                            record['id'],
+                            record['document_id'],
+                            record['content'],
+                            Jsonb(record['metadata']),
+                            halfvec_literal(record['embedding'])
+                        ))
+                cur.execute(_MERGE_SQL)
+
+        yield copy_batch
+        # Returning the connection to the pool commits the transaction
@@ -0,0 +1,41 @@
+"""Course settings lookups."""
+from cachetools import TTLCache
+from app.services.supabase import get_supabase_client
+import threading
+
+# Course system prompts change rarely, so they are cached per process. Edits
+# invalidate this worker's entry immediately; other workers pick them up
+# within the TTL.
+_system_prompt_cache = TTLCache(maxsize=1024, ttl=300)
+_system_prompt_cache_lock = threading.Lock()
+
+
+def get_system_prompt(course_id: str) -> str:
+    """
+    Get a course's system prompt.
+
+    Args:
+        course_id: Course ID
+
+    Returns:
+        The course's system prompt
+    """
+    with _system_prompt_cache_lock:
+        cached = _system_prompt_cache.get(course_id)
+    if cached is not None:
+        return cached
+
+    supabase = get_supabase_client()
+    course = supabase.table('courses').select('system_prompt').eq('id', course_id).single().execute()
+    system_prompt = course.data.get('system_prompt', 'You are a helpful teaching assistant.')
+
+    with _system_prompt_cache_lock:
+        _system_prompt_cache[course_id] = system_prompt
+
+    return system_prompt
+
+
+def invalidate_system_prompt(course_id: str):
+    """Drop a course's cached system prompt (call after updating it)."""
+    with _system_prompt_cache_lock:
+        _system_prompt_cache.pop(course_id, None)
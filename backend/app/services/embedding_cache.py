@@ -0,0 +1,92 @@
+"""Persistent cache of document chunk embeddings (embedding_cache table)."""
+from supabase import Client
+from app.utils.vectors import halfvec_literal
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Entries older than this are pruned; cached texts may belong to documents since deleted
+_CACHE_MAX_AGE_DAYS = 90
+
+# Pruning runs at most this often per process (a full-table DELETE isn't worth running per upload)
+_PRUNE_INTERVAL_SECONDS = 24 * 60 * 60
+_last_prune = None
+_prune_lock = threading.Lock()
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """Cache key for a document text: hex sha256 of model and exact text."""
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+def load_cached_embeddings(supabase: Client, keys: list) -> dict:
+    """
+    Look up cached embeddings in one round-trip.
+
+    Lookup failures are logged and treated as misses, so the cache can
+    never fail document processing.
+
+    Args:
+        supabase: Supabase client
+        keys: Cache keys (see embedding_cache_key)
+
+    Returns:
+        {key: embedding} for the keys that were cached
+    """
+    try:
+        response = supabase.rpc('get_cached_embeddings', {'cache_keys': keys}).execute()
+        # halfvec comes back as its text form '[x1,x2,...]', which is valid JSON
+        return {row['key']: json.loads(row['embedding']) for row in response.data or []}
+
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {str(e)}")
+        return {}
+
+
+def store_embeddings(supabase: Client, embeddings: dict):
+    """
+    Add embeddings to the cache (existing keys are left as they are).
+
+    Args:
+        supabase: Supabase client
+        embeddings: {key: embedding}
+    """
+    try:
+        supabase.table('embedding_cache').upsert(
+            [{'key': key, 'embedding': halfvec_literal(embedding)} for key, embedding in embeddings.items()],
+            ignore_duplicates=True,
+            returning='minimal'
+        ).execute()
+
+    except Exception as e:
+        logger.warning(f"Embedding cache write failed: {str(e)}")
+
+
+def prune_embedding_cache(supabase: Client):
+    """
+    Delete cache entries older than _CACHE_MAX_AGE_DAYS.
+
+    Does nothing if this process already pruned within _PRUNE_INTERVAL_SECONDS.
+
+    Args:
+        supabase: Supabase client
+    """
+    global _last_prune
+
+    with _prune_lock:
+        now = time.monotonic()
+        if _last_prune is not None and now - _last_prune < _PRUNE_INTERVAL_SECONDS:
+            return
+        _last_prune = now
+
+    try:
+        response = supabase.rpc('prune_embedding_cache', {'max_age_days': _CACHE_MAX_AGE_DAYS}).execute()
+        if response.data:
+            logger.info(f"Pruned {response.data} expired embedding cache entries")
+
+    except Exception as e:
+        logger.warning(f"Embedding cache pruning failed: {str(e)}")
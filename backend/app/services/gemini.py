@@ -1,17 +1,104 @@
 """Google Gemini API integration."""
 import google.generativeai as genai
+from array import array
+from cachetools import LRUCache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
+from app.extensions import cache
+from app.services.embedding_cache import embedding_cache_key, load_cached_embeddings, store_embeddings
+from app.services.supabase import get_supabase_client
+from itertools import islice
+import hashlib
 import logging
+import re
+import threading
 
 logger = logging.getLogger(__name__)
 
+# genai.configure() is process-global, so it only needs to run once
+_gemini_configured = False
+_gemini_config_lock = threading.Lock()
+
+# GenerativeModel instances by model name (stateless, safe to share across threads)
+_models = {}
+
+# Concurrent batchEmbedContents requests per process (bounds load on the Gemini quota)
+_EMBEDDING_CONCURRENCY = 4
+_embedding_executor = ThreadPoolExecutor(max_workers=_EMBEDDING_CONCURRENCY, thread_name_prefix='embed')
+
+# Exact-match cache for generate_embedding (float32 arrays, ~3 KB per entry)
+_embedding_cache = LRUCache(maxsize=4096)
+_embedding_cache_lock = threading.Lock()
+
+# Lifetime of embeddings in the shared (cross-process) cache
+_SHARED_EMBEDDING_TTL = 7 * 24 * 3600
+
+# What the model is told to say when the context doesn't cover the question
+_NO_INFO_ANSWER = "I don't have enough information in the course materials to answer this question"
+
+# RAG answer prompt; only the system prompt, context and question vary per request
+_ANSWER_PROMPT = """System: {system_prompt}
+
+Context (use ONLY this information to answer):
+{context_text}
+
+User Question: {question}
+
+Instructions:
+- Answer the question using ONLY the context provided above
+- Include citations in your answer in the format: (source_name, page X) or (source_name, timestamp Xs)
+- If the context doesn't contain relevant information, say "{no_info_answer}"
+- Be helpful and clear in your explanation
+- After your answer, add one final line in exactly this format: CONFIDENCE: <number between 0.0 and 1.0>
+  Rate how well the context supports your answer and how directly it addresses the question. Be CONSERVATIVE:
+  above 0.8 only if the answer is clearly well-supported and direct; 0.5-0.8 if it is partially supported or somewhat indirect;
+  below 0.5 if it lacks support, is vague or uncertain. If you could not answer the question, use a value from 0.40 to 0.50.
+
+Answer:"""
+
+# Final line of a generated answer carrying the model's confidence in it
+_CONFIDENCE_LABEL = 'CONFIDENCE:'
+_CONFIDENCE_LINE = re.compile(r'^[ \t*]*CONFIDENCE:\s*\**\s*(\d+(?:\.\d+)?)[ \t*]*$', re.IGNORECASE | re.MULTILINE)
+
+# Phrases that indicate the model hedged or could not answer (lowercase)
+_UNCERTAINTY_PHRASES = (
+    "i don't have enough information",
+    "i cannot answer",
+    "not sure",
+    "unclear",
+    "might be",
+    "possibly",
+    "perhaps"
+)
+
+# All phrases in one case-insensitive alternation, so an answer is scanned once
+_UNCERTAINTY_PATTERN = re.compile('|'.join(map(re.escape, _UNCERTAINTY_PHRASES)), re.IGNORECASE)
+
+
 # Configure Gemini API
 def configure_gemini():
-    """Configure Gemini with API key from config."""
-    api_key = current_app.config['GEMINI_API_KEY']
-    if not api_key:
-        raise ValueError('Gemini API key is missing')
-    genai.configure(api_key=api_key)
+    """Configure Gemini with API key from config (once per process)."""
+    global _gemini_configured
+
+    if _gemini_configured:
+        return
+
+    with _gemini_config_lock:
+        if not _gemini_configured:
+            api_key = current_app.config['GEMINI_API_KEY']
+            if not api_key:
+                raise ValueError('Gemini API key is missing')
+            genai.configure(api_key=api_key)
+            _gemini_configured = True
+
+
+def _get_model(model_name: str) -> genai.GenerativeModel:
+    """Get a GenerativeModel, reusing one instance per model name."""
+    model = _models.get(model_name)
+    if model is None:
+        model = _models.setdefault(model_name, genai.GenerativeModel(model_name))
+    return model
 
 
 def call_gemini(prompt: str, temperature: float = 0.7) -> str:
@@ -29,7 +116,7 @@ def call_gemini(prompt: str, temperature: float = 0.7) -> str:
         configure_gemini()
         model_name = current_app.config['GEMINI_CHAT_MODEL']
 
-        model = genai.GenerativeModel(model_name)
+        model = _get_model(model_name)
         response = model.generate_content(
             prompt,
             generation_config=genai.types.GenerationConfig(
@@ -48,6 +135,10 @@ def generate_embedding(text: str) -> list:
     """
     Generate embedding for text using Gemini embedding model.
 
+    Results are cached by model and exact text, first in-process and
+    then in the shared app cache (Redis when CACHE_TYPE is RedisCache), so
+    repeated questions skip the Gemini round-trip across workers too.
+
     Args:
         text: Input text to embed
 
@@ -58,19 +149,101 @@ def generate_embedding(text: str) -> list:
         configure_gemini()
         model = current_app.config['GEMINI_EMBEDDING_MODEL']
 
-        result = genai.embed_content(
-            model=model,
-            content=text,
-            task_type="retrieval_document"
-        )
+        cache_key = _local_embedding_key(model, text)
+        with _embedding_cache_lock:
+            cached = _embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached.tolist()
+
+        # 'v2': keyed on exact text (v1 keys were of normalized text)
+        shared_key = f"embedding:v2:{model}:{cache_key[1].hex()}"
+        shared = cache.get(shared_key)
+        if shared is not None:
+            embedding = array('f')
+            embedding.frombytes(shared)
+        else:
+            result = genai.embed_content(
+                model=model,
+                content=text,
+                task_type="retrieval_document"
+            )
+            embedding = array('f', result['embedding'])
+            # Embeddings for a given model never change; packed float32 is ~3 KB
+            cache.set(shared_key, embedding.tobytes(), timeout=_SHARED_EMBEDDING_TTL)
 
-        return result['embedding']
+        with _embedding_cache_lock:
+            _embedding_cache[cache_key] = embedding
+
+        return embedding.tolist()
 
     except Exception as e:
         logger.error(f"Error generating embedding: {str(e)}")
         raise
 
 
+def _local_embedding_key(model: str, text: str) -> tuple:
+    """Key for the in-process and shared embedding caches: model plus hash of the exact text."""
+    return model, hashlib.sha256(text.encode()).digest()
+
+
+def iter_embedding_batches(texts):
+    """
+    Generate embeddings batch by batch, yielding each batch as soon as it is ready.
+
+    Texts are consumed lazily in groups of up to EMBEDDING_BATCH_SIZE. Each group
+    is looked up in the persistent embedding cache and the misses are sent as a
+    single batchEmbedContents request. At most _EMBEDDING_CONCURRENCY groups
+    are in flight at once, so callers can store one batch while later ones are
+    still being embedded, and only that window of texts is held in memory.
+
+    Args:
+        texts: Iterable of input texts to embed
+
+    Yields:
+        List of embedding vectors for each consecutive batch of texts
+    """
+    try:
+        configure_gemini()
+        model = current_app.config['GEMINI_EMBEDDING_MODEL']
+        batch_size = current_app.config['EMBEDDING_BATCH_SIZE']
+
+        # Fetched here, in the app context; embed_batch runs on executor threads
+        supabase = get_supabase_client()
+
+        def embed_batch(batch: list) -> list:
+            # Only texts missing from the persistent cache are sent to Gemini
+            keys = [embedding_cache_key(model, text) for text in batch]
+            embeddings = load_cached_embeddings(supabase, keys)
+
+            missing = {key: text for key, text in zip(keys, batch) if key not in embeddings}
+            if missing:
+                result = genai.embed_content(
+                    model=model,
+                    content=list(missing.values()),
+                    task_type="retrieval_document"
+                )
+                new_embeddings = dict(zip(missing, result['embedding']))
+                store_embeddings(supabase, new_embeddings)
+                embeddings.update(new_embeddings)
+
+            return [embeddings[key] for key in keys]
+
+        texts = iter(texts)
+        in_flight = deque()
+
+        while batch := list(islice(texts, batch_size)):
+            in_flight.append(_embedding_executor.submit(embed_batch, batch))
+            if len(in_flight) == _EMBEDDING_CONCURRENCY:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    except Exception as e:
+        logger.error(f"Error generating batch embeddings: {str(e)}")
+        raise
+
+
 def generate_answer(question: str, context_chunks: list, verified_answers: list, system_prompt: str) -> dict:
     """
     Generate answer using Gemini chat model with RAG context.
@@ -88,156 +261,224 @@ def generate_answer(question: str, context_chunks: list, verified_answers: list,
             "confidence_score": float (0.0-1.0)
         }
     """
+    # With nothing retrieved the prompt dictates the answer, so skip the Gemini call
+    if not context_chunks and not verified_answers:
+        return no_context_answer()
+
     try:
         configure_gemini()
         model_name = current_app.config['GEMINI_CHAT_MODEL']
 
-        # Construct context from chunks
-        context_parts = []
+        prompt = _build_answer_prompt(question, context_chunks, verified_answers, system_prompt)
 
-        # Add verified answers first (higher priority)
-        for i, verified in enumerate(verified_answers):
-            context_parts.append(f"[VERIFIED ANSWER {i+1}]")
-            context_parts.append(f"Q: {verified.get('question', '')}")
-            context_parts.append(f"A: {verified.get('answer', '')}")
-            context_parts.append("")
+        # Generate response
+        model = _get_model(model_name)
+        response = model.generate_content(prompt)
 
-        # Add document chunks
-        for i, chunk in enumerate(context_chunks):
-            metadata = chunk.get('metadata', {})
-            content = chunk.get('content', '')
+        return finalize_answer(response.text, context_chunks, verified_answers)
 
-            source_info = f"[Source: {metadata.get('file_name', 'unknown')}"
-            if 'page' in metadata:
-                source_info += f", page {metadata['page']}"
-            if 'start_time' in metadata:
-                source_info += f", timestamp {metadata['start_time']}s"
-            source_info += "]"
+    except Exception as e:
+        logger.error(f"Error generating answer: {str(e)}")
+        raise
 
-            context_parts.append(source_info)
-            context_parts.append(content)
-            context_parts.append("")
 
-        context_text = "\n".join(context_parts)
+def stream_answer(question: str, context_chunks: list, verified_answers: list, system_prompt: str) -> 'AnswerStream':
+    """
+    Generate answer using Gemini chat model with RAG context, streaming the text.
 
-        # Construct prompt
-        prompt = f"""System: {system_prompt}
+    Iterate over the returned AnswerStream for answer text fragments, then
+    call finalize_answer with its .text to get citations and the confidence
+    score.
 
-Context (use ONLY this information to answer):
-{context_text}
+    Args:
+        question: User's question
+        context_chunks: Retrieved document chunks
+        verified_answers: TA-verified answers
+        system_prompt: Course-specific system prompt
 
-User Question: {question}
+    Returns:
+        AnswerStream over the Gemini response
+    """
+    try:
+        configure_gemini()
+        model_name = current_app.config['GEMINI_CHAT_MODEL']
 
-Instructions:
-- Answer the question using ONLY the context provided above
-- Include citations in your answer in the format: (source_name, page X) or (source_name, timestamp Xs)
-- If the context doesn't contain relevant information, say "I don't have enough information in the course materials to answer this question"
-- Be helpful and clear in your explanation
+        prompt = _build_answer_prompt(question, context_chunks, verified_answers, system_prompt)
 
-Answer:"""
+        model = _get_model(model_name)
+        return AnswerStream(model.generate_content(prompt, stream=True))
 
-        # Generate response
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt)
-        answer_text = response.text
+    except Exception as e:
+        logger.error(f"Error streaming answer: {str(e)}")
+        raise
 
-        # Parse citations from answer (filter by similarity threshold of 0.85)
-        citations = extract_citations(answer_text, context_chunks, verified_answers, similarity_threshold=0.65)
 
-        # Calculate confidence score
-        confidence_score = calculate_confidence_score(
-            question=question,
-            answer=answer_text,
-            context_chunks=context_chunks,
-            verified_answers=verified_answers
-        )
+class AnswerStream:
+    """
+    Answer text fragments from a streaming Gemini response.
 
-        return {
-            'answer': answer_text,
-            'citations': citations,
-            'confidence_score': confidence_score,
-            'sources_used': len(context_chunks) + len(verified_answers)
-        }
+    The model ends its answer with a confidence line, which is held back
+    from the fragments. The complete raw response (for finalize_answer) is
+    available as .text once iteration finishes.
+    """
 
-    except Exception as e:
-        logger.error(f"Error generating answer: {str(e)}")
-        raise
+    def __init__(self, response):
+        self._response = response
+        self.text = ''
+
+    def __iter__(self):
+        emitted = 0
+        try:
+            for chunk in self._response:
+                self.text += chunk.text
+                end = _visible_end(self.text, emitted)
+                if end > emitted:
+                    yield self.text[emitted:end]
+                    emitted = end
+
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            raise
+
+        end = _visible_end(self.text, emitted, final=True)
+        if end > emitted:
+            yield self.text[emitted:end]
+
+
+def _visible_end(text: str, start: int, final: bool = False) -> int:
+    """
+    End of the text that can be shown to the user so far.
 
+    Stops at the confidence line if it has arrived. While streaming, a
+    last line that could still turn into the confidence line is held back.
+    """
+    trailer = _CONFIDENCE_LINE.search(text, start)
+    if trailer:
+        return trailer.start()
+    if final:
+        return len(text)
+
+    line_start = text.rfind('\n') + 1
+    if line_start < start:
+        # Part of this line was already shown, so it isn't the confidence line
+        return len(text)
+
+    candidate = text[line_start:].lstrip(' \t*').upper()
+    if _CONFIDENCE_LABEL.startswith(candidate) or candidate.startswith(_CONFIDENCE_LABEL):
+        return line_start
+    return len(text)
 
-def calculate_confidence_score(question: str, answer: str, context_chunks: list, verified_answers: list) -> float:
+
+def no_context_answer() -> dict:
     """
-    Calculate confidence score for the generated answer using Gemini.
-    Uses a conservative estimate based on multiple factors.
+    Answer payload for a question with no retrieved context.
+
+    The answer prompt requires the fixed "not enough information" reply in
+    this case, so it is returned without calling Gemini.
+
+    Returns:
+        Answer payload (same shape as generate_answer)
+    """
+    return {
+        'answer': _NO_INFO_ANSWER,
+        'citations': [],
+        'confidence_score': calculate_heuristic_confidence(_NO_INFO_ANSWER, [], []),
+        'sources_used': 0
+    }
+
+
+def finalize_answer(answer_text: str, context_chunks: list, verified_answers: list) -> dict:
+    """
+    Split the confidence line off a generated answer and attach citations.
 
     Args:
-        question: User's question
-        answer: Generated answer
+        answer_text: Raw generated text (answer followed by its confidence line)
         context_chunks: Retrieved document chunks
         verified_answers: TA-verified answers
 
     Returns:
-        Float between 0.0 and 1.0 representing confidence level
+        Answer payload (same shape as generate_answer)
     """
-    try:
-        configure_gemini()
-        model_name = current_app.config['GEMINI_CHAT_MODEL']
+    answer_text, model_confidence = _split_confidence(answer_text)
+
+    # Parse citations from answer (filter by similarity threshold of 0.85)
+    citations = extract_citations(answer_text, context_chunks, verified_answers, similarity_threshold=0.65)
+
+    # The model rates its own answer in the same call; fall back to heuristics if it didn't
+    if model_confidence is None:
+        logger.warning("Answer had no confidence line, using heuristic confidence")
+        confidence_score = calculate_heuristic_confidence(answer_text, context_chunks, verified_answers)
+    else:
+        confidence_score = _adjust_confidence(model_confidence, verified_answers)
+
+    return {
+        'answer': answer_text,
+        'citations': citations,
+        'confidence_score': confidence_score,
+        'sources_used': len(context_chunks) + len(verified_answers)
+    }
+
+
+def _split_confidence(text: str) -> tuple:
+    """Split generated text into (answer, confidence), confidence None if the line is missing."""
+    trailer = _CONFIDENCE_LINE.search(text)
+    if not trailer:
+        return text.strip(), None
+    return text[:trailer.start()].strip(), float(trailer.group(1))
+
+
+def _build_answer_prompt(question: str, context_chunks: list, verified_answers: list, system_prompt: str) -> str:
+    """Build the RAG prompt from the course system prompt, retrieved context and question."""
+    # Construct context from chunks
+    context_parts = []
+
+    # Add verified answers first (higher priority)
+    for i, verified in enumerate(verified_answers, start=1):
+        context_parts.append(
+            f"[VERIFIED ANSWER {i}]\nQ: {verified.get('question', '')}\nA: {verified.get('answer', '')}\n"
+        )
 
-        # Build confidence evaluation prompt
-        confidence_prompt = f"""You are evaluating the confidence level of an AI-generated answer.
+    # Add document chunks
+    for chunk in context_chunks:
+        metadata = chunk.get('metadata', {})
 
-Question: {question}
+        source_info = f"[Source: {metadata.get('file_name', 'unknown')}"
+        if 'page' in metadata:
+            source_info += f", page {metadata['page']}"
+        if 'start_time' in metadata:
+            source_info += f", timestamp {metadata['start_time']}s"
 
-Generated Answer: {answer}
+        context_parts.append(f"{source_info}]\n{chunk.get('content', '')}\n")
 
-Number of context sources used: {len(context_chunks)}
-Number of verified answers available: {len(verified_answers)}
+    return _ANSWER_PROMPT.format(
+        system_prompt=system_prompt,
+        no_info_answer=_NO_INFO_ANSWER,
+        context_text="\n".join(context_parts),
+        question=question
+    )
 
-Evaluate the confidence level for this answer on a scale of 0.0 to 1.0 based on:
-1. How well the answer is supported by the context
-2. Whether the answer directly addresses the question
-3. The specificity and detail of the answer
-4. The presence of citations
-5. Whether verified answers were available
-6. Any hedging language or uncertainty in the answer
 
-Be CONSERVATIVE in your estimate. Only give high scores (>0.8) if the answer is clearly well-supported and directly addresses the question.
-Give medium scores (0.5-0.8) for answers that are partially supported or somewhat indirect.
-Give low scores (<0.5) for answers that lack support, are vague, or show uncertainty.
-If you were unable to answer the question, you must give a 0.5 or below (If you respond that you don't know the answer, then randomize the value from 0.40 to 0.50, with precision up to 2 significant figures).
+def _adjust_confidence(confidence: float, verified_answers: list) -> float:
+    """
+    Apply conservative adjustments to the model's self-rated confidence.
 
-Respond with ONLY a single decimal number between 0.0 and 1.0, nothing else."""
+    (Answers with no context never get here; see no_context_answer.)
 
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(
-            confidence_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0,  # Use deterministic output for consistency
-            )
-        )
+    Args:
+        confidence: Confidence reported by the model
+        verified_answers: TA-verified answers
 
-        # Parse confidence score from response
-        confidence_text = response.text.strip()
-        try:
-            confidence = float(confidence_text)
-            # Clamp to valid range
-            confidence = max(0.0, min(1.0, confidence))
-
-            # Apply additional conservative adjustment based on context availability
-            if len(context_chunks) == 0 and len(verified_answers) == 0:
-                confidence *= 0.3  # Heavily penalize answers with no context
-            elif len(verified_answers) > 0:
-                confidence = min(1.0, confidence * 1.1)  # Slight boost for verified answers
-
-            return round(confidence, 2)
-        except ValueError:
-            logger.warning(f"Could not parse confidence score from: {confidence_text}")
-            # Fallback: use heuristic-based confidence
-            return calculate_heuristic_confidence(answer, context_chunks, verified_answers)
+    Returns:
+        Float between 0.0 and 1.0 representing confidence level
+    """
+    # Clamp to valid range
+    confidence = max(0.0, min(1.0, confidence))
 
-    except Exception as e:
-        logger.error(f"Error calculating confidence score: {str(e)}")
-        # Return conservative fallback confidence
-        return calculate_heuristic_confidence(answer, context_chunks, verified_answers)
+    # Slight boost for verified answers
+    if len(verified_answers) > 0:
+        confidence = min(1.0, confidence * 1.1)
+
+    return round(confidence, 2)
 
 
 def calculate_heuristic_confidence(answer: str, context_chunks: list, verified_answers: list) -> float:
@@ -255,18 +496,7 @@ def calculate_heuristic_confidence(answer: str, context_chunks: list, verified_a
     confidence = 0.5  # Start with neutral confidence
 
     # Check for uncertainty phrases
-    uncertainty_phrases = [
-        "i don't have enough information",
-        "i cannot answer",
-        "not sure",
-        "unclear",
-        "might be",
-        "possibly",
-        "perhaps"
-    ]
-    answer_lower = answer.lower()
-
-    if any(phrase in answer_lower for phrase in uncertainty_phrases):
+    if _UNCERTAINTY_PATTERN.search(answer):
         confidence -= 0.3
 
     # Boost for having context
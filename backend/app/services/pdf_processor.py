@@ -1,73 +1,154 @@
 """PDF document processing."""
-import requests
-from PyPDF2 import PdfReader
-from io import BytesIO
-from app.services.gemini import generate_embedding
-from app.services.supabase import get_supabase_client
+import pypdfium2 as pdfium
+from app.services.chunk_store import embed_and_store_chunks
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import logging
+import multiprocessing
+import os
+import tempfile
+import threading
 
 logger = logging.getLogger(__name__)
 
+# PDFs with at least this many pages have their text extracted in parallel
+_PARALLEL_MIN_PAGES = 32
+_EXTRACT_WORKERS = min(os.cpu_count() or 1, 4)
 
-def process_pdf(document_id: str, file_url: str, course_id: str):
+# Created on first large PDF, shared by all uploads in this process
+_extract_executor = None
+_extract_executor_lock = threading.Lock()
+
+# PDFium is not thread-safe and uploads are processed on several background
+# threads, so every in-process PDFium call holds this lock (worker processes
+# each have their own PDFium)
+_pdfium_lock = threading.Lock()
+
+
+def process_pdf(document_id: str, pdf_bytes: bytes, course_id: str, file_name: str):
     """
     Process PDF file: extract text, chunk it, generate embeddings, and store.
 
     Args:
         document_id: ID of the document record
-        file_url: URL to the PDF file
+        pdf_bytes: Raw PDF file content
         course_id: Course ID
+        file_name: Original file name (recorded in each chunk's metadata for citations)
     """
     try:
         logger.info(f"Processing PDF document {document_id}")
 
-        # Download PDF
-        response = requests.get(file_url)
-        pdf_file = BytesIO(response.content)
+        # Metadata shared by every chunk of this document
+        base_metadata = {'file_name': file_name, 'type': 'pdf'}
 
-        # Parse PDF
-        reader = PdfReader(pdf_file)
-        supabase = get_supabase_client()
+        # Extract and chunk pages lazily; chunks are embedded and stored as they are produced
+        chunk_records = (
+            {
+                'document_id': document_id,
+                'content': chunk_content,
+                'metadata': {**base_metadata, 'page': page_num, 'chunk_index': chunk_idx}
+            }
+            for page_num, text in extract_pages(pdf_bytes)
+            if text.strip()
+            for chunk_idx, chunk_content in enumerate(chunk_text(text, max_tokens=500))
+        )
 
-        # Get file name from document record
-        doc = supabase.table('course_documents').select('file_name').eq('id', document_id).single().execute()
-        file_name = doc.data['file_name']
+        # Generate embeddings and store chunks
+        embed_and_store_chunks(chunk_records)
 
-        # Process each page
-        for page_num, page in enumerate(reader.pages, start=1):
-            text = page.extract_text()
+        logger.info(f"Successfully processed PDF {document_id}")
 
-            if not text.strip():
-                continue
+    except Exception as e:
+        logger.error(f"Error processing PDF {document_id}: {str(e)}")
+        raise
 
-            # Chunk text (simple approach: chunk by page)
-            # TODO: Implement more sophisticated chunking (by paragraph, token limit, etc.)
-            chunks = chunk_text(text, max_tokens=500)
 
-            for chunk_idx, chunk_content in enumerate(chunks):
-                # Generate embedding
-                embedding = generate_embedding(chunk_content)
+def extract_pages(pdf_bytes: bytes):
+    """
+    Extract text from each page of a PDF using PDFium.
 
-                # Store chunk
-                chunk_record = {
-                    'document_id': document_id,
-                    'content': chunk_content,
-                    'metadata': {
-                        'page': page_num,
-                        'chunk_index': chunk_idx,
-                        'file_name': file_name,
-                        'type': 'pdf'
-                    },
-                    'embedding': embedding
-                }
+    Large PDFs are split into page ranges extracted in worker processes
+    (PDFium is CPU-bound and not thread-safe); small ones are extracted
+    in-process under _pdfium_lock.
 
-                supabase.table('document_chunks').insert(chunk_record).execute()
+    Args:
+        pdf_bytes: Raw PDF file content
 
-        logger.info(f"Successfully processed PDF {document_id}")
+    Yields:
+        (page_num, text) tuples, in page order, with 1-based page numbers
+    """
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            page_count = len(pdf)
+
+            # Small PDFs are extracted in-process, all pages at once so the lock
+            # isn't held while the caller embeds them
+            pages = None
+            if page_count < _PARALLEL_MIN_PAGES or _EXTRACT_WORKERS == 1:
+                pages = list(_iter_page_text(pdf, 0, page_count))
+        finally:
+            pdf.close()
+
+    if pages is not None:
+        yield from pages
+        return
+
+    step = -(-page_count // _EXTRACT_WORKERS)
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+
+    # Workers open the PDF from a temp file rather than each being sent a pickled
+    # copy of the bytes; PDFium then reads only the parts of the file it needs
+    fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
 
-    except Exception as e:
-        logger.error(f"Error processing PDF {document_id}: {str(e)}")
-        raise
+        # map() yields ranges in order, so pages stream out as soon as the first range is done
+        for pages in _get_extract_executor().map(_extract_page_range, repeat(pdf_path), starts, stops):
+            yield from pages
+    finally:
+        os.remove(pdf_path)
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list:
+    """Extract pages [start, stop) in a worker process (each worker opens its own document)."""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return list(_iter_page_text(pdf, start, stop))
+    finally:
+        pdf.close()
+
+
+def _iter_page_text(pdf, start: int, stop: int):
+    """Yield (page_num, text) for pages [start, stop) of an open document."""
+    for page_index in range(start, stop):
+        page = pdf[page_index]
+        textpage = page.get_textpage()
+        try:
+            # PDFium uses CRLF line endings; normalize so paragraph splitting works
+            yield page_index + 1, textpage.get_text_range().replace('\r\n', '\n')
+        finally:
+            textpage.close()
+            page.close()
+
+
+def _get_extract_executor() -> ProcessPoolExecutor:
+    """Get the page extraction process pool, creating it on first use."""
+    global _extract_executor
+
+    if _extract_executor is None:
+        with _extract_executor_lock:
+            if _extract_executor is None:
+                # spawn, not fork: forking a process with live threads (gunicorn gthread,
+                # the I/O pools) can deadlock the child on inherited locks
+                _extract_executor = ProcessPoolExecutor(
+                    max_workers=_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+
+    return _extract_executor
 
 
 def chunk_text(text: str, max_tokens: int = 500) -> list:
@@ -86,20 +167,24 @@ def chunk_text(text: str, max_tokens: int = 500) -> list:
     max_chars = max_tokens * 4
 
     chunks = []
-    current_chunk = ""
+    # Paragraphs of the chunk being built; current_len counts each with its "\n\n" separator
+    current_parts = []
+    current_len = 0
 
     # Split by paragraphs first
     paragraphs = text.split('\n\n')
 
     for para in paragraphs:
-        if len(current_chunk) + len(para) < max_chars:
-            current_chunk += para + "\n\n"
+        if current_len + len(para) < max_chars:
+            current_parts.append(para)
+            current_len += len(para) + 2
         else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = para + "\n\n"
+            if current_parts:
+                chunks.append('\n\n'.join(current_parts).strip())
+            current_parts = [para]
+            current_len = len(para) + 2
 
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    if current_parts:
+        chunks.append('\n\n'.join(current_parts).strip())
 
     return chunks
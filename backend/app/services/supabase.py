@@ -1,29 +1,68 @@
 """Supabase client configuration."""
 from supabase import create_client, Client
 from flask import current_app
+from psycopg_pool import ConnectionPool
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 _supabase_client = None
+_supabase_client_lock = threading.Lock()
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
 
 
 def get_supabase_client() -> Client:
-    """Get or create Supabase client instance."""
+    """Get or create Supabase client instance (shared across requests and threads)."""
     global _supabase_client
 
     if _supabase_client is None:
-        url = current_app.config['SUPABASE_URL']
-        key = current_app.config['SUPABASE_SERVICE_ROLE_KEY']
+        with _supabase_client_lock:
+            # Another thread may have created the client while we waited
+            if _supabase_client is None:
+                url = current_app.config['SUPABASE_URL']
+                key = current_app.config['SUPABASE_SERVICE_ROLE_KEY']
 
-        if not url or not key:
-            raise ValueError('Supabase configuration is missing')
+                if not url or not key:
+                    raise ValueError('Supabase configuration is missing')
 
-        # Create client with minimal options to avoid compatibility issues
-        _supabase_client = create_client(
-            supabase_url=url,
-            supabase_key=key
-        )
-        logger.info('Supabase client initialized')
+                # Create client with minimal options to avoid compatibility issues
+                _supabase_client = create_client(
+                    supabase_url=url,
+                    supabase_key=key
+                )
+                logger.info('Supabase client initialized')
 
     return _supabase_client
+
+
+def get_db_pool() -> ConnectionPool | None:
+    """
+    Get or create the direct Postgres connection pool (for bulk COPY).
+
+    Returns:
+        Shared connection pool, or None if SUPABASE_DB_URL is not configured
+    """
+    global _db_pool
+
+    if _db_pool is None:
+        db_url = current_app.config.get('SUPABASE_DB_URL')
+        if not db_url:
+            return None
+
+        with _db_pool_lock:
+            if _db_pool is None:
+                # Small pool: Supabase limits direct connections per project
+                _db_pool = ConnectionPool(
+                    db_url,
+                    min_size=1,
+                    max_size=5,
+                    timeout=30,
+                    max_lifetime=1800,
+                    check=ConnectionPool.check_connection
+                )
+                logger.info('Postgres connection pool initialized')
+
+    return _db_pool
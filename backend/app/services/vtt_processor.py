@@ -1,59 +1,55 @@
 """VTT (Video Transcript) processing."""
-import requests
 import re
-from app.services.gemini import generate_embedding
-from app.services.supabase import get_supabase_client
+from app.services.chunk_store import embed_and_store_chunks
 import logging
 
 logger = logging.getLogger(__name__)
 
+# A cue: its timing line (format: 00:00:00.000 --> 00:00:05.000, captured as
+# hours/minutes/seconds, then optional cue settings) and its text up to the next blank line
+_CUE = re.compile(
+    r'(\d{2}):(\d{2}):(\d{2}\.\d{3})[^\S\n]*-->[^\S\n]*(\d{2}):(\d{2}):(\d{2}\.\d{3})[^\n]*'
+    r'(.*?)(?=\n\n|\Z)',
+    re.DOTALL
+)
 
-def process_vtt(document_id: str, file_url: str, course_id: str):
+
+def process_vtt(document_id: str, vtt_bytes: bytes, course_id: str, file_name: str):
     """
     Process VTT file: parse transcript with timestamps, generate embeddings.
 
     Args:
         document_id: ID of the document record
-        file_url: URL to the VTT file
+        vtt_bytes: Raw VTT file content
         course_id: Course ID
+        file_name: Original file name (recorded in each chunk's metadata for citations)
     """
     try:
         logger.info(f"Processing VTT document {document_id}")
 
-        # Download VTT
-        response = requests.get(file_url)
-        vtt_content = response.text
+        # WebVTT is always UTF-8 (utf-8-sig drops an optional BOM)
+        vtt_content = vtt_bytes.decode('utf-8-sig')
 
         # Parse VTT
         segments = parse_vtt(vtt_content)
 
-        supabase = get_supabase_client()
-
-        # Get file name from document record
-        doc = supabase.table('course_documents').select('file_name').eq('id', document_id).single().execute()
-        file_name = doc.data['file_name']
-
         # Group segments into chunks (e.g., 30-second chunks)
         chunks = group_segments(segments, duration=30)
 
-        for chunk in chunks:
-            # Generate embedding for chunk text
-            embedding = generate_embedding(chunk['text'])
+        # Metadata shared by every chunk of this document
+        base_metadata = {'file_name': file_name, 'type': 'vtt'}
 
-            # Store chunk
-            chunk_record = {
+        chunk_records = (
+            {
                 'document_id': document_id,
                 'content': chunk['text'],
-                'metadata': {
-                    'start_time': chunk['start_time'],
-                    'end_time': chunk['end_time'],
-                    'file_name': file_name,
-                    'type': 'vtt'
-                },
-                'embedding': embedding
+                'metadata': {**base_metadata, 'start_time': chunk['start_time'], 'end_time': chunk['end_time']}
             }
+            for chunk in chunks
+        )
 
-            supabase.table('document_chunks').insert(chunk_record).execute()
+        # Generate embeddings and store chunks
+        embed_and_store_chunks(chunk_records)
 
         logger.info(f"Successfully processed VTT {document_id}")
 
@@ -74,46 +70,23 @@ def parse_vtt(vtt_content: str) -> list:
     """
     segments = []
 
-    # Split by double newline (VTT cue separator)
-    cues = re.split(r'\n\n', vtt_content)
-
-    for cue in cues:
-        lines = cue.strip().split('\n')
-
-        # Find timestamp line (format: 00:00:00.000 --> 00:00:05.000)
-        timestamp_pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})'
-
-        for i, line in enumerate(lines):
-            match = re.search(timestamp_pattern, line)
-            if match:
-                start_str, end_str = match.groups()
-                start_time = timestamp_to_seconds(start_str)
-                end_time = timestamp_to_seconds(end_str)
+    # One pass over the raw content; the first timing line in each cue starts it
+    for match in _CUE.finditer(vtt_content):
+        start_h, start_m, start_s, end_h, end_m, end_s, text = match.groups()
 
-                # Text is on following lines
-                text = ' '.join(lines[i+1:]).strip()
+        # Text lines are joined with spaces
+        text = text.strip().replace('\n', ' ')
 
-                if text:
-                    segments.append({
-                        'start': start_time,
-                        'end': end_time,
-                        'text': text
-                    })
-                break
+        if text:
+            segments.append({
+                'start': int(start_h) * 3600 + int(start_m) * 60 + float(start_s),
+                'end': int(end_h) * 3600 + int(end_m) * 60 + float(end_s),
+                'text': text
+            })
 
     return segments
 
 
-def timestamp_to_seconds(timestamp: str) -> float:
-    """Convert VTT timestamp (HH:MM:SS.mmm) to seconds."""
-    parts = timestamp.split(':')
-    hours = int(parts[0])
-    minutes = int(parts[1])
-    seconds = float(parts[2])
-
-    return hours * 3600 + minutes * 60 + seconds
-
-
 def group_segments(segments: list, duration: int = 30) -> list:
     """
     Group consecutive segments into larger chunks.
@@ -126,40 +99,35 @@ def group_segments(segments: list, duration: int = 30) -> list:
         List of {"start_time": float, "end_time": float, "text": str}
     """
     chunks = []
-    current_chunk = {
-        'start_time': None,
-        'end_time': None,
-        'text': ''
-    }
+    start_time = None
+    end_time = None
+    texts = []
 
     for segment in segments:
-        if current_chunk['start_time'] is None:
-            current_chunk['start_time'] = segment['start']
+        if start_time is None:
+            start_time = segment['start']
 
-        current_chunk['end_time'] = segment['end']
-        current_chunk['text'] += ' ' + segment['text']
+        end_time = segment['end']
+        texts.append(segment['text'])
 
         # Check if chunk duration reached
-        if current_chunk['end_time'] - current_chunk['start_time'] >= duration:
+        if end_time - start_time >= duration:
             chunks.append({
-                'start_time': current_chunk['start_time'],
-                'end_time': current_chunk['end_time'],
-                'text': current_chunk['text'].strip()
+                'start_time': start_time,
+                'end_time': end_time,
+                'text': ' '.join(texts).strip()
             })
 
             # Reset for next chunk
-            current_chunk = {
-                'start_time': None,
-                'end_time': None,
-                'text': ''
-            }
+            start_time = None
+            texts = []
 
     # Add remaining chunk if any
-    if current_chunk['text']:
+    if texts:
         chunks.append({
-            'start_time': current_chunk['start_time'],
-            'end_time': current_chunk['end_time'],
-            'text': current_chunk['text'].strip()
+            'start_time': start_time,
+            'end_time': end_time,
+            'text': ' '.join(texts).strip()
         })
 
     return chunks
@@ -2,18 +2,26 @@
 from functools import wraps
 from flask import request, jsonify
 from app.services.supabase import get_supabase_client
+from cachetools import TTLCache
 import jwt
 from flask import current_app
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# User roles by user ID, so authenticated requests skip the users-table lookup.
+# Role changes (e.g. promotion to TA) take effect within the TTL.
+_role_cache = TTLCache(maxsize=10000, ttl=300)
+_role_cache_lock = threading.Lock()
+
 
 def require_auth(f):
     """
     Decorator to require authentication for API endpoints.
 
-    Validates Supabase JWT token from Authorization header.
+    Validates Supabase JWT token from Authorization header (locally when
+    SUPABASE_JWT_SECRET is set, otherwise with Supabase Auth).
     Passes user data to the wrapped function.
     """
     @wraps(f)
@@ -28,9 +36,7 @@ def require_auth(f):
             # Extract token (format: "Bearer <token>")
             token = auth_header.split(' ')[1] if ' ' in auth_header else auth_header
 
-            # Decode JWT token (don't verify signature since Supabase handles that)
-            # We just need to extract the user ID
-            decoded = jwt.decode(token, options={"verify_signature": False})
+            decoded = _decode_token(token)
 
             user_id = decoded.get('sub')  # 'sub' contains the user ID
             user_email = decoded.get('email')
@@ -38,21 +44,13 @@ def require_auth(f):
             if not user_id:
                 return jsonify({'error': 'Invalid token'}), 401
 
-            # Get user role from users table
-            supabase = get_supabase_client()
-            user_record = supabase.table('users').select('role').eq('id', user_id).execute()
-
-            # If user doesn't exist in users table, create them with default role
-            if not user_record.data:
-                # Create user entry
-                supabase.table('users').insert({
-                    'id': user_id,
-                    'email': user_email,
-                    'role': 'student'  # Default role
-                }).execute()
-                role = 'student'
-            else:
-                role = user_record.data[0].get('role', 'student')
+            with _role_cache_lock:
+                role = _role_cache.get(user_id)
+
+            if role is None:
+                role = _get_user_role(user_id, user_email)
+                with _role_cache_lock:
+                    _role_cache[user_id] = role
 
             user_info = {
                 'id': user_id,
@@ -68,3 +66,30 @@ def require_auth(f):
             return jsonify({'error': 'Authentication failed'}), 401
 
     return decorated_function
+
+
+def _decode_token(token: str) -> dict:
+    """
+    Verify a Supabase access token and return its claims ('sub' and 'email').
+
+    Verified locally when SUPABASE_JWT_SECRET is set; otherwise Supabase Auth
+    validates it (one round-trip per request). Invalid tokens raise.
+    """
+    jwt_secret = current_app.config['SUPABASE_JWT_SECRET']
+
+    if not jwt_secret:
+        user = get_supabase_client().auth.get_user(token).user
+        return {'sub': user.id, 'email': user.email}
+
+    return jwt.decode(token, jwt_secret, algorithms=['HS256'], audience='authenticated')
+
+
+def _get_user_role(user_id: str, user_email: str) -> str:
+    """Get a user's role, creating them as a student if missing (one round-trip via ensure_user_role)."""
+    supabase = get_supabase_client()
+    response = supabase.rpc('ensure_user_role', {
+        'target_user_id': user_id,
+        'target_email': user_email
+    }).execute()
+
+    return response.data or 'student'
@@ -0,0 +1,50 @@
+"""Thread pools for overlapping independent I/O calls and background work."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import copy_current_request_context, current_app
+
+# Shared across requests; Supabase and Gemini calls are network-bound
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='io')
+
+# Long-running jobs that outlive the request (document ingestion); kept small
+# so a burst of uploads can't starve request handling
+_background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='background')
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """
+    Run a function on the shared I/O thread pool.
+
+    The current request context is copied into the worker thread so the
+    function can use current_app (e.g. Supabase and Gemini configuration).
+
+    Args:
+        fn: Function to run
+        *args, **kwargs: Arguments passed to fn
+
+    Returns:
+        Future for the function's result
+    """
+    return _executor.submit(copy_current_request_context(fn), *args, **kwargs)
+
+
+def run_in_background(fn, *args, **kwargs) -> Future:
+    """
+    Run a function on the background pool after the request has returned.
+
+    The function runs inside an application context (not a request context,
+    which is gone by then), so it can use current_app but not request.
+
+    Args:
+        fn: Function to run
+        *args, **kwargs: Arguments passed to fn
+
+    Returns:
+        Future for the function's result
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args, **kwargs)
+
+    return _background_executor.submit(run)
@@ -0,0 +1,36 @@
+"""orjson-backed JSON provider for Flask."""
+from decimal import Decimal
+from flask.json.provider import JSONProvider
+import orjson
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Serialize types orjson doesn't handle natively."""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class ORJSONProvider(JSONProvider):
+    """
+    JSON provider using orjson (C implementation) instead of the stdlib encoder.
+
+    Installed as app.json, so jsonify() and request.json use it transparently.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=_OPTIONS),
+            mimetype='application/json'
+        )
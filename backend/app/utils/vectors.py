@@ -0,0 +1,19 @@
+"""Wire formats for embedding vectors."""
+
+
+def halfvec_literal(embedding) -> str:
+    """
+    Format an embedding as a compact pgvector text literal ('[x1,x2,...]').
+
+    Values are written with 5 significant digits, more than halfvec
+    (float16) keeps, so nothing is lost for halfvec columns and queries
+    cast to halfvec. The literal is less than half the size of the same
+    vector as Python float reprs (up to 17 digits each).
+
+    Args:
+        embedding: Sequence of floats
+
+    Returns:
+        Text literal accepted for vector and halfvec columns and parameters
+    """
+    return '[' + ','.join(map('{:.5g}'.format, embedding)) + ']'
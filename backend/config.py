@@ -15,6 +15,10 @@ class Config:
     # Supabase
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    # Optional direct Postgres connection string, used for bulk COPY of document chunks
+    SUPABASE_DB_URL = os.getenv('SUPABASE_DB_URL')
+    # JWT secret (Project Settings > API) for verifying access tokens locally
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
 
     # Gemini
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -24,9 +28,19 @@ class Config:
 
     # RAG Configuration
     EMBEDDING_DIMENSION = 768  # text-embedding-004 dimension
+    EMBEDDING_BATCH_SIZE = 100  # Max texts per batchEmbedContents request
     SIMILARITY_THRESHOLD = 0.7
     MAX_CONTEXT_CHUNKS = 5
 
+    # Response caching (SimpleCache is per-process; use RedisCache with multiple workers)
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 45
+
+    # Response compression
+    COMPRESS_ALGORITHM = ['br', 'gzip']
+    COMPRESS_MIN_SIZE = 512
+
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
 
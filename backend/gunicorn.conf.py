@@ -0,0 +1,17 @@
+"""Gunicorn configuration for production.
+
+Handlers spend most of their time waiting on Supabase and Gemini, so each
+worker runs a thread pool (gthread) to serve concurrent requests while
+others are blocked on I/O.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Gemini calls and document processing can take well over the default 30s
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react'
 import { uploadDocument, getDocuments, CourseDocument } from '../../services/api'
+import { useDocumentStatusPolling } from '../../hooks/useDocumentStatusPolling'
 
 interface FileUploadProps {
   courseId: string
@@ -27,6 +28,9 @@ function FileUpload({ courseId, courseName }: FileUploadProps) {
     }
   }
 
+  // Documents are processed in the background; poll until none are in progress
+  const restartPolling = useDocumentStatusPolling(documents, loadDocuments)
+
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
       setSelectedFile(e.target.files[0])
@@ -52,6 +56,8 @@ function FileUpload({ courseId, courseName }: FileUploadProps) {
       // Reset file input
       const fileInput = document.getElementById('fileInput') as HTMLInputElement
       if (fileInput) fileInput.value = ''
+      // A new upload restarts status polling
+      restartPolling()
       // Reload documents list
       await loadDocuments()
     } catch (err) {
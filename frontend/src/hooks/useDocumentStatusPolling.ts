@@ -0,0 +1,40 @@
+import { useCallback, useEffect, useRef } from 'react'
+import { CourseDocument } from '../services/api'
+
+// Polling gives up after 10 minutes; a document can be left in
+// 'processing' if the backend restarts mid-processing
+const POLL_INTERVAL_MS = 3000
+const MAX_POLLS = 200
+
+/**
+ * Reload documents while any are still being processed in the background.
+ *
+ * @param documents - Currently loaded documents
+ * @param loadDocuments - Reloads the documents (polling continues as they change)
+ * @returns Function that restarts polling, e.g. after a new upload
+ */
+export function useDocumentStatusPolling(
+  documents: CourseDocument[],
+  loadDocuments: () => void
+): () => void {
+  const pollsLeft = useRef(MAX_POLLS)
+
+  useEffect(() => {
+    const inProgress = documents.some(
+      (doc) => doc.processing_status === 'pending' || doc.processing_status === 'processing'
+    )
+    if (!inProgress) {
+      pollsLeft.current = MAX_POLLS
+      return
+    }
+    if (pollsLeft.current <= 0) return
+
+    pollsLeft.current -= 1
+    const timer = setTimeout(loadDocuments, POLL_INTERVAL_MS)
+    return () => clearTimeout(timer)
+  }, [documents])
+
+  return useCallback(() => {
+    pollsLeft.current = MAX_POLLS
+  }, [])
+}
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react'
 import { uploadDocument, getDocuments, CourseDocument } from '../services/api'
+import { useDocumentStatusPolling } from '../hooks/useDocumentStatusPolling'
 import Header from '../components/Header'
 
 export default function DocumentManagement() {
@@ -24,6 +25,9 @@ export default function DocumentManagement() {
     }
   }
 
+  // Documents are processed in the background; poll until none are in progress
+  const restartPolling = useDocumentStatusPolling(documents, loadDocuments)
+
   const handleFileUpload = async (
     event: React.ChangeEvent<HTMLInputElement>
   ) => {
@@ -57,6 +61,8 @@ export default function DocumentManagement() {
         `✅ ${file.name} uploaded successfully! Processing...`
       )
 
+      // A new upload restarts status polling
+      restartPolling()
       // Reload documents after successful upload
       setTimeout(() => {
         loadDocuments()
@@ -0,0 +1,13 @@
+-- Migration 13: Add composite index for analytics time-range queries
+-- Description: Lets analytics filter qa_logs by course and created_at in a single index scan
+-- Depends on: 04_create_qa_logs.sql
+
+-- Composite index for course-scoped time range filters (analytics dashboard)
+CREATE INDEX IF NOT EXISTS idx_qa_logs_course_created_at
+  ON public.qa_logs(course_id, created_at DESC);
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'qa_logs (course_id, created_at) index created successfully!';
+END $$;
@@ -0,0 +1,50 @@
+-- Migration 14: Create Analytics Functions
+-- Description: Computes course analytics metrics in the database instead of in the backend
+-- Depends on: 04_create_qa_logs.sql, 13_add_qa_logs_course_created_index.sql
+
+-- Function to aggregate question count, rating, flagged count and daily volume for a course
+CREATE OR REPLACE FUNCTION course_analytics(
+  filter_course_id UUID,
+  since TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS TABLE (
+  total_questions INT,
+  avg_rating NUMERIC,
+  flagged_count INT,
+  volume JSON
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH logs AS (
+    SELECT ql.rating, ql.status, ql.created_at
+    FROM public.qa_logs ql
+    WHERE
+      ql.course_id = filter_course_id
+      AND (since IS NULL OR ql.created_at >= since)
+  ),
+  daily AS (
+    SELECT
+      COALESCE(to_char(l.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD'), 'unknown') AS day,
+      COUNT(*)::INT AS question_count
+    FROM logs l
+    GROUP BY 1
+  )
+  SELECT
+    (SELECT COUNT(*)::INT FROM logs),
+    (SELECT COALESCE(AVG(l.rating), 0)::NUMERIC FROM logs l),
+    (SELECT COUNT(*)::INT FROM logs l WHERE l.status = 'flagged'),
+    (SELECT COALESCE(
+       json_agg(json_build_object('date', d.day, 'count', d.question_count) ORDER BY d.day),
+       '[]'::json
+     ) FROM daily d);
+END;
+$$;
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'Analytics functions created successfully!';
+END $$;
@@ -0,0 +1,46 @@
+-- Migration 15: Create Course Students Function
+-- Description: Counts questions per student for a course in the database
+-- Depends on: 02_create_core_tables.sql, 04_create_qa_logs.sql
+
+-- Function to list students who asked questions in a course, with question counts
+CREATE OR REPLACE FUNCTION course_students(
+  filter_course_id UUID
+)
+RETURNS TABLE (
+  id UUID,
+  email TEXT,
+  question_count INT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    u.id,
+    u.email,
+    COUNT(*)::INT AS question_count
+  FROM public.qa_logs ql
+  INNER JOIN public.users u ON u.id = ql.user_id
+  WHERE
+    ql.course_id = filter_course_id
+    AND u.role = 'student'
+  GROUP BY u.id, u.email;
+END;
+$$;
+
+-- Composite index for per-course, per-student lookups; created_at also serves the
+-- teacher chat-log view (course + student, newest first) from the same index
+--
+-- Hot qa_logs filters and their indexes:
+--   (course_id, status = 'flagged')   -> idx_qa_logs_flagged (07, partial)
+--   (course_id, created_at)           -> idx_qa_logs_course_created_at (13)
+--   (course_id, user_id, created_at)  -> idx_qa_logs_course_user_created_at (this migration)
+CREATE INDEX IF NOT EXISTS idx_qa_logs_course_user_created_at
+  ON public.qa_logs(course_id, user_id, created_at DESC);
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'Course students function created successfully!';
+END $$;
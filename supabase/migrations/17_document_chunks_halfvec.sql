@@ -0,0 +1,57 @@
+-- Migration 17: Store document chunk embeddings as half-precision vectors
+-- Description: Converts document_chunks.embedding from vector(768) to halfvec(768),
+--              halving storage, index size and memory bandwidth per similarity search
+-- Depends on: 05_create_functions.sql, 07_create_indexes.sql
+-- Requires: pgvector 0.7.0+ (halfvec type)
+
+-- Drop the old vector index (rebuilt below for the new type)
+DROP INDEX IF EXISTS public.idx_document_chunks_embedding;
+
+-- Convert existing embeddings in place
+ALTER TABLE public.document_chunks
+  ALTER COLUMN embedding TYPE halfvec(768) USING embedding::halfvec(768);
+
+-- Recreate the vector index for half-precision cosine distance
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding
+  ON public.document_chunks
+  USING ivfflat (embedding halfvec_cosine_ops)
+  WITH (lists = 100);
+
+-- Match function keeps its vector(768) signature; the query is cast to halfvec
+CREATE OR REPLACE FUNCTION match_document_chunks(
+  query_embedding vector(768),
+  match_count INT DEFAULT 5,
+  filter_course_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    dc.id,
+    dc.document_id,
+    dc.content,
+    dc.metadata,
+    1 - (dc.embedding <=> query_embedding::halfvec(768)) AS similarity
+  FROM public.document_chunks dc
+  INNER JOIN public.course_documents cd ON dc.document_id = cd.id
+  WHERE
+    (filter_course_id IS NULL OR cd.course_id = filter_course_id)
+    AND dc.embedding IS NOT NULL
+  ORDER BY dc.embedding <=> query_embedding::halfvec(768)
+  LIMIT match_count;
+END;
+$$;
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'document_chunks embeddings converted to halfvec(768) successfully!';
+END $$;
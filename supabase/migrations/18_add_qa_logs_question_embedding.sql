@@ -0,0 +1,16 @@
+-- Migration 18: Add question_embedding to qa_logs
+-- Description: Stores the question embedding computed when a question is answered,
+--              so submitting a TA correction can reuse it instead of re-embedding
+-- Depends on: 04_create_qa_logs.sql
+
+-- Same model and dimensions as ta_verified_answers.embedding (text-embedding-004)
+ALTER TABLE public.qa_logs
+ADD COLUMN IF NOT EXISTS question_embedding vector(768);
+
+COMMENT ON COLUMN public.qa_logs.question_embedding IS 'Embedding of the question, copied into ta_verified_answers when a TA submits a correction. NULL for rows logged before this column existed.';
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'question_embedding column added to qa_logs table successfully!';
+END $$;
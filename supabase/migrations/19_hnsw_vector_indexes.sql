@@ -0,0 +1,51 @@
+-- Migration 19: Replace IVFFlat vector indexes with HNSW
+-- Description: HNSW gives better recall/latency than IVFFlat, needs no training data
+--              (IVFFlat lists are fixed when the index is built, usually on an empty table)
+--              and stays accurate as chunks are added
+-- Depends on: 07_create_indexes.sql, 17_document_chunks_halfvec.sql
+-- Requires: pgvector 0.8.0+ (hnsw.iterative_scan)
+
+-- ============================================
+-- DOCUMENT CHUNKS
+-- ============================================
+
+DROP INDEX IF EXISTS public.idx_document_chunks_embedding;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding
+  ON public.document_chunks
+  USING hnsw (embedding halfvec_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- ============================================
+-- TA VERIFIED ANSWERS
+-- ============================================
+
+DROP INDEX IF EXISTS public.idx_ta_verified_answers_embedding;
+
+CREATE INDEX IF NOT EXISTS idx_ta_verified_answers_embedding
+  ON public.ta_verified_answers
+  USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- ============================================
+-- SEARCH SETTINGS
+-- ============================================
+
+-- ef_search: candidates kept per search (recall vs. speed; must be >= match_count).
+-- iterative_scan: keep scanning when the course filter removes most candidates,
+-- so a course with a small share of the rows still gets match_count results.
+ALTER FUNCTION match_document_chunks(vector, INT, UUID)
+  SET hnsw.ef_search = 40;
+ALTER FUNCTION match_document_chunks(vector, INT, UUID)
+  SET hnsw.iterative_scan = 'relaxed_order';
+
+ALTER FUNCTION match_verified_answers(vector, INT, UUID)
+  SET hnsw.ef_search = 40;
+ALTER FUNCTION match_verified_answers(vector, INT, UUID)
+  SET hnsw.iterative_scan = 'relaxed_order';
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'HNSW vector indexes created successfully!';
+END $$;
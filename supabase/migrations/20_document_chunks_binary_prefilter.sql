@@ -0,0 +1,67 @@
+-- Migration 20: Binary-quantized prefilter for document chunk search
+-- Description: Indexes a 1-bit-per-dimension copy of each chunk embedding (96 bytes vs
+--              1.5 KB for halfvec(768)) and searches it first by Hamming distance,
+--              then re-ranks the candidates by exact cosine distance on the halfvec
+-- Depends on: 17_document_chunks_halfvec.sql, 19_hnsw_vector_indexes.sql
+-- Requires: pgvector 0.8.0+ (binary_quantize on halfvec, hnsw.iterative_scan)
+
+-- The halfvec HNSW index is replaced by a much smaller index on the quantized vectors
+DROP INDEX IF EXISTS public.idx_document_chunks_embedding;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_bq
+  ON public.document_chunks
+  USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- Match function: Hamming prefilter (10x overfetch) then exact re-rank.
+-- ef_search must cover the candidate count, so it is raised from 40 (migration 19).
+CREATE OR REPLACE FUNCTION match_document_chunks(
+  query_embedding vector(768),
+  match_count INT DEFAULT 5,
+  filter_course_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+SET hnsw.ef_search = 100
+SET hnsw.iterative_scan = 'relaxed_order'
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH candidates AS (
+    SELECT
+      dc.id,
+      dc.document_id,
+      dc.content,
+      dc.metadata,
+      dc.embedding
+    FROM public.document_chunks dc
+    INNER JOIN public.course_documents cd ON dc.document_id = cd.id
+    WHERE
+      (filter_course_id IS NULL OR cd.course_id = filter_course_id)
+      AND dc.embedding IS NOT NULL
+    ORDER BY binary_quantize(dc.embedding)::bit(768) <~> binary_quantize(query_embedding::halfvec(768))
+    LIMIT match_count * 10
+  )
+  SELECT
+    c.id,
+    c.document_id,
+    c.content,
+    c.metadata,
+    1 - (c.embedding <=> query_embedding::halfvec(768)) AS similarity
+  FROM candidates c
+  ORDER BY c.embedding <=> query_embedding::halfvec(768)
+  LIMIT match_count;
+END;
+$$;
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'document_chunks binary quantized prefilter created successfully!';
+END $$;
@@ -0,0 +1,58 @@
+-- Migration 21: Create persistent embedding cache for document chunks
+-- Description: Stores document chunk embeddings keyed by a hash of model and text, so
+--              reprocessing a document (or identical text in another document)
+--              reuses embeddings instead of calling Gemini again
+--              Entries expire after a while (see prune_embedding_cache), since nothing
+--              ties them to a document that might be deleted
+-- Depends on: 01_enable_pgvector.sql
+-- Requires: pgvector 0.7.0+ (halfvec type)
+
+-- key = hex sha256(model || '\0' || text); halfvec matches document_chunks.embedding
+CREATE TABLE IF NOT EXISTS public.embedding_cache (
+  key TEXT PRIMARY KEY,
+  embedding halfvec(768) NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Backend (service role) only: RLS on with no policies
+ALTER TABLE public.embedding_cache ENABLE ROW LEVEL SECURITY;
+
+-- Index for age-based pruning
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at
+  ON public.embedding_cache (created_at);
+
+-- Batch lookup (keys go in the request body rather than a long IN (...) query string)
+CREATE OR REPLACE FUNCTION get_cached_embeddings(cache_keys TEXT[])
+RETURNS TABLE (
+  key TEXT,
+  embedding halfvec(768)
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT ec.key, ec.embedding
+  FROM public.embedding_cache ec
+  WHERE ec.key = ANY(cache_keys);
+$$;
+
+-- Delete entries older than max_age_days (run by the backend at most once a day per worker)
+CREATE OR REPLACE FUNCTION prune_embedding_cache(max_age_days INT DEFAULT 90)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  deleted_count INT;
+BEGIN
+  DELETE FROM public.embedding_cache
+  WHERE created_at < NOW() - make_interval(days => max_age_days);
+
+  GET DIAGNOSTICS deleted_count = ROW_COUNT;
+  RETURN deleted_count;
+END;
+$$;
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'Embedding cache created successfully!';
+END $$;
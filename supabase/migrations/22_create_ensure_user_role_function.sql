@@ -0,0 +1,40 @@
+-- Migration 22: Create ensure_user_role function
+-- Description: Returns a user's role, creating their profile as a student if it doesn't
+--              exist, so authentication needs one round-trip instead of select + insert
+-- Depends on: 02_create_core_tables.sql
+
+CREATE OR REPLACE FUNCTION ensure_user_role(
+  target_user_id UUID,
+  target_email TEXT
+)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  user_role TEXT;
+BEGIN
+  SELECT u.role INTO user_role
+  FROM public.users u
+  WHERE u.id = target_user_id;
+
+  IF user_role IS NULL THEN
+    -- Profile missing (e.g. created before the auth trigger); default to student.
+    -- ON CONFLICT covers a concurrent request creating it first.
+    INSERT INTO public.users (id, email, role)
+    VALUES (target_user_id, target_email, 'student')
+    ON CONFLICT (id) DO NOTHING;
+
+    SELECT u.role INTO user_role
+    FROM public.users u
+    WHERE u.id = target_user_id;
+  END IF;
+
+  RETURN user_role;
+END;
+$$;
+
+-- Success message
+DO $$
+BEGIN
+  RAISE NOTICE 'ensure_user_role function created successfully!';
+END $$;